@@ -0,0 +1,314 @@
+# engine.py
+# Inference engine: runs the camera / YOLO / tracker loop in its own
+# process and publishes live state to the web tier (app.py) over ipc.py.
+#
+#   python engine.py
+#
+# Every active Camera gets its own detection worker; the workers share one
+# YOLO model and take turns through scheduler.InferenceScheduler.
+import threading
+import time
+import datetime
+
+import cv2
+from flask import Flask
+from sqlalchemy.exc import SQLAlchemyError
+from ultralytics import YOLO
+
+from models import db, init_db, Camera, ZoneMeta, CountLog, AlertLog
+from tracker_utils import CentroidTracker, get_centroid
+from zones import draw_all_zones, ZoneWatcher
+from camera_feed import open_source, read_frame
+from ipc import StatePublisher
+from tiling import TiledDetector
+from scheduler import InferenceScheduler
+
+# minimal app, only used for DB access (app_context)
+app = Flask(__name__)
+init_db(app)
+
+# ----------------- TILED INFERENCE -----------------
+# High-res / dense scenes: cut the frame into overlapping tiles so distant
+# heads are not shrunk away at imgsz=640. See tiling.TiledDetector.
+TILING = {
+    "tiled": True,          # False -> one full-frame predict, as before
+    "tile_size": None,      # source pixels; None -> cost model picks per camera
+    "overlap": 0.2,         # fraction of tile size
+    "zones_only": False,    # only run tiles that touch a zone
+}
+
+# ----------------- CAMERAS -----------------
+DEFAULT_SOURCE = ("video", "sample2.mp4")  # used when no camera is active in the DB
+CAMERA_RELOAD_INTERVAL = 5.0               # seconds between fps / priority reloads
+RATES_INTERVAL = 1.0                       # seconds between scheduler reports
+SHOW_PREVIEW = True                        # local OpenCV windows
+
+# ----------------- DETECTION LOOP -----------------
+def load_zone_thresholds():
+    """{zone_id: threshold} from ZoneMeta, polled by the ZoneWatcher."""
+    with app.app_context():
+        rows = db.session.query(ZoneMeta.zone_id, ZoneMeta.threshold).all()
+        db.session.remove()
+    return {zid: threshold for zid, threshold in rows}
+
+def load_cameras():
+    """Active cameras as plain dicts (usable outside the app context)."""
+    with app.app_context():
+        cams = [
+            {
+                "id": c.id,
+                "name": c.name,
+                "source_type": c.source_type,
+                "source_path": c.source_path,
+                "target_fps": 5.0 if c.target_fps is None else c.target_fps,
+                "min_fps": 0.0 if c.min_fps is None else c.min_fps,
+                "priority": 1 if c.priority is None else c.priority,
+            }
+            for c in Camera.query.filter_by(active=True).order_by(Camera.id).all()
+        ]
+        db.session.remove()
+    if not cams:
+        source_type, source_path = DEFAULT_SOURCE
+        cams = [{
+            "id": 0, "name": "default",
+            "source_type": source_type, "source_path": source_path,
+            "target_fps": 5.0, "min_fps": 1.0, "priority": 1,
+        }]
+    # zones without a camera_id in zones.json belong to the first camera
+    for i, cam in enumerate(cams):
+        cam["primary"] = i == 0
+    return cams
+
+
+class LiveState:
+    """
+    Latest result of every camera, merged into the one state that is
+    published to the web tier. Each zone is counted by exactly one camera
+    (see CompiledZones.for_camera), so zones_now shows the same number the
+    owning camera checked its threshold against.
+    """
+
+    def __init__(self, publisher):
+        self.publisher = publisher
+        self.per_camera = {}  # cam_id -> (zone counts, people, alerts)
+        self.lock = threading.Lock()
+
+    def update(self, cam_id, zone_counts, people, alerts):
+        with self.lock:
+            self.per_camera[cam_id] = (zone_counts, people, alerts)
+            self._publish()
+
+    def drop(self, cam_id):
+        with self.lock:
+            self.per_camera.pop(cam_id, None)
+            self._publish()
+
+    def _publish(self):
+        zones_now, people, alerts = {}, {}, []
+        for cam_id, (counts, cam_people, cam_alerts) in sorted(self.per_camera.items()):
+            for zid, count in counts.items():
+                zones_now[int(zid)] = int(count)
+            for tid, info in cam_people.items():
+                people[f"{cam_id}:{tid}"] = info
+            alerts.extend(cam_alerts)
+        self.publisher.publish({
+            "total_now": int(sum(zones_now.values())),
+            "zones_now": zones_now,
+            "alerts": alerts,
+            "people": people,
+        })
+
+
+def detection_loop(cam, model, watcher, scheduler, live, previews, stop):
+    cam_id = cam["id"]
+    source_type = cam["source_type"]
+    source_path = cam["source_path"]
+    if source_type == "video" and not source_path:
+        source_path = "sample.mp4"
+    cap, is_image, image_frame = open_source(source_type, source_path)
+    if source_type != "image" and cap is None:
+        print(f"Error: cannot open source for camera {cam['name']}")
+        scheduler.remove(cam_id)
+        return
+
+    detector = TiledDetector(model, target_fps=cam["target_fps"], **TILING)
+    tracker = CentroidTracker(max_distance=60)
+
+    # video files: skip frames between turns so the file plays in real
+    # time at the scheduled rate instead of in slow motion
+    video_fps = cap.get(cv2.CAP_PROP_FPS) if source_type == "video" else 0
+    last_read = None
+
+    try:
+        while not stop.is_set():
+            # frame I/O happens outside the inference turn, so a camera
+            # waiting on its next frame never holds up the others
+            if video_fps > 0 and last_read is not None:
+                for _ in range(int((time.monotonic() - last_read) * video_fps) - 1):
+                    if not cap.grab():
+                        break
+            last_read = time.monotonic()
+
+            ret, frame = read_frame(cap, is_image, image_frame)
+            if not ret or frame is None:
+                print(f"No more frames / cannot read frame ({cam['name']}).")
+                break
+
+            compiled = watcher.current.for_camera(cam_id, cam["primary"])  # one consistent zone set per frame
+            # raw frame, not display: the drawn zone boxes must not reach YOLO
+            zone_rects = [r[1:] for r in compiled.rects]
+
+            if not scheduler.acquire(cam_id):
+                break
+            # tile grid sized from the camera's share of the central budget
+            detector.frame_budget = scheduler.frame_budget(cam_id)
+            t0 = time.perf_counter()
+            try:
+                detections = detector.detect(frame, zone_rects)
+            finally:
+                # only inference counts towards the camera's cost
+                scheduler.release(cam_id, time.perf_counter() - t0)
+
+            zones = compiled.zones
+            tracked = tracker.update(detections)
+
+            zone_current_counts = {z["id"]: 0 for z in zones}
+            people_info = {}  # id -> {zone, x, y, t, camera}
+            now_str = datetime.datetime.now().strftime("%H:%M:%S")  # once per frame
+
+            for tid, x1, y1, x2, y2 in tracked:
+                cx, cy = get_centroid(x1, y1, x2, y2)
+                zone_here = None
+                for zid in compiled.zones_for_point(cx, cy):
+                    zone_here = zid
+                    zone_current_counts[zid] += 1
+                people_info[tid] = {
+                    "zone": zone_here,
+                    "x": int(cx),
+                    "y": int(cy),
+                    "t": now_str,
+                    "camera": cam_id
+                }
+
+            now_utc = datetime.datetime.utcnow()
+            alerts = []
+            with app.app_context():
+                try:
+                    for zid, count in zone_current_counts.items():
+                        clog = CountLog(timestamp=now_utc, camera_id=cam_id, zone_id=zid, count=count)
+                        db.session.add(clog)
+
+                        threshold = compiled.thresholds.get(zid)
+                        if threshold is not None and count > threshold:
+                            msg = f"[{now_utc.strftime('%H:%M:%S')}] {cam['name']}: Zone {zid} exceeded threshold {threshold} with {count}"
+                            al = AlertLog(
+                                timestamp=now_utc,
+                                camera_id=cam_id,
+                                zone_id=zid,
+                                count=count,
+                                threshold=threshold,
+                                message=msg
+                            )
+                            db.session.add(al)
+                            alerts.append(msg)
+                    db.session.commit()
+                except SQLAlchemyError as e:
+                    # e.g. "database is locked": drop this frame's rows, keep counting
+                    db.session.rollback()
+                    print(f"DB write failed ({cam['name']}):", e)
+
+            live.update(cam_id, zone_current_counts, people_info, alerts)
+
+            if not SHOW_PREVIEW:
+                continue
+
+            # local preview, shown by the main thread (HighGUI is not thread-safe)
+            display = frame.copy()
+            draw_all_zones(display, zones)
+            for tid, x1, y1, x2, y2 in tracked:
+                cx, cy = get_centroid(x1, y1, x2, y2)
+                cv2.rectangle(display, (x1, y1), (x2, y2), (0, 255, 255), 2)
+                cv2.putText(display, f"ID {tid}", (x1, y1 - 10),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 255), 2)
+                cv2.circle(display, (cx, cy), 3, (0, 0, 255), -1)
+
+            y0 = 30
+            for z in zones:
+                zid = z["id"]
+                text = f"Zone {zid}: {zone_current_counts[zid]}"
+                cv2.putText(display, text, (10, y0),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
+                y0 += 30
+
+            previews[cam_id] = (f"CrowdCount - {cam['name']}", display)
+    finally:
+        # also on errors: otherwise the dashboard keeps showing this
+        # camera's last counts as live
+        if cap is not None:
+            cap.release()
+        scheduler.remove(cam_id)
+        live.drop(cam_id)
+
+def main():
+    publisher = StatePublisher().start()
+    # zones.json / ZoneMeta edits are picked up in the background and
+    # swapped in between frames; model and tracker IDs are kept
+    watcher = ZoneWatcher(meta_loader=load_zone_thresholds).start()
+    scheduler = InferenceScheduler()
+    live = LiveState(publisher)
+    model = YOLO("yolov8n.pt")  # shared; the scheduler runs one inference at a time
+    previews = {}               # cam_id -> (window title, image)
+    stop = threading.Event()
+
+    cameras = load_cameras()
+    workers = {}  # cam_id -> thread
+    for cam in cameras:
+        scheduler.configure(cam["id"], cam["name"], cam["target_fps"],
+                            cam["min_fps"], cam["priority"])
+    for cam in cameras:
+        w = threading.Thread(
+            target=detection_loop,
+            args=(cam, model, watcher, scheduler, live, previews, stop),
+            daemon=True
+        )
+        w.start()
+        workers[cam["id"]] = w
+
+    next_reload = time.monotonic() + CAMERA_RELOAD_INTERVAL
+    next_rates = time.monotonic()
+    try:
+        while any(w.is_alive() for w in workers.values()):
+            if SHOW_PREVIEW:
+                for title, display in list(previews.values()):
+                    cv2.imshow(title, display)
+                if cv2.waitKey(30) & 0xFF == ord('q'):
+                    break
+            else:
+                time.sleep(0.1)
+
+            if time.monotonic() >= next_rates:
+                next_rates = time.monotonic() + RATES_INTERVAL
+                # own channel: changes every frame, must not touch the state ETag
+                publisher.publish(scheduler.report(), channel="rates")
+
+            if time.monotonic() >= next_reload:
+                next_reload = time.monotonic() + CAMERA_RELOAD_INTERVAL
+                # rate / priority edits from the admin panel; adding or
+                # removing cameras still needs an engine restart
+                for cam in load_cameras():
+                    w = workers.get(cam["id"])
+                    if w is not None and w.is_alive():
+                        scheduler.configure(cam["id"], cam["name"], cam["target_fps"],
+                                            cam["min_fps"], cam["priority"])
+    finally:
+        stop.set()
+        scheduler.stop()
+        for w in workers.values():
+            w.join(timeout=2)
+        watcher.stop()
+        publisher.close()
+        cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+# ipc.py
+import gzip
+import hashlib
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener, Client
+
+# Local channel between the inference engine (engine.py) and the web
+# tier (app.py). Unix socket on POSIX, loopback TCP on Windows.
+# Override with CROWD_IPC_ADDRESS="/path/to.sock" or "127.0.0.1:6001".
+#
+# Only raw bytes cross the channel (send_bytes / recv_bytes, never
+# pickle), the socket lives in a directory only this user can write to,
+# and both sides prove they know the key: CROWD_IPC_KEY, or a random key
+# the engine writes to RUN_DIR/ipc.key (mode 0600) on first start.
+RUN_DIR = os.environ.get("CROWD_RUN_DIR") or (
+    os.path.join(os.environ["XDG_RUNTIME_DIR"], "crowdcount")
+    if os.environ.get("XDG_RUNTIME_DIR")
+    else os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "run")
+)
+KEY_FILE = os.path.join(RUN_DIR, "ipc.key")
+
+RETRY_INTERVAL = 1.0  # seconds between reconnect attempts
+MAX_AGE = 0.1         # web side: seconds a snapshot is reused before asking again
+GZIP_MIN_SIZE = 1024  # smaller bodies are not worth compressing
+MAX_MESSAGE = 32 * 1024 * 1024
+
+
+def _check_private_dir(path):
+    """Refuse directories other local users could plant a socket / key in."""
+    if sys.platform == "win32":
+        return
+    st = os.stat(path)
+    if st.st_uid != os.getuid() or st.st_mode & 0o022:
+        raise RuntimeError(f"{path} must be owned by this user and not group/world writable")
+
+
+def ensure_run_dir():
+    os.makedirs(RUN_DIR, mode=0o700, exist_ok=True)
+    _check_private_dir(RUN_DIR)
+    return RUN_DIR
+
+
+def get_address():
+    addr = os.environ.get("CROWD_IPC_ADDRESS")
+    if addr:
+        if ":" in addr and not addr.startswith("/"):
+            host, port = addr.rsplit(":", 1)
+            return (host, int(port))
+        _check_private_dir(os.path.dirname(os.path.abspath(addr)))
+        return addr
+    if sys.platform == "win32":
+        return ("127.0.0.1", 6001)
+    return os.path.join(ensure_run_dir(), "engine.sock")
+
+
+def load_key(create=False):
+    """
+    The shared IPC key. The engine calls this with create=True; the web
+    tier just reads it and gets None until the engine has run once.
+    """
+    env_key = os.environ.get("CROWD_IPC_KEY")
+    if env_key:
+        return env_key.encode("utf-8")
+    ensure_run_dir()
+    if create and not os.path.exists(KEY_FILE):
+        try:
+            fd = os.open(KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass  # created concurrently
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+    try:
+        with open(KEY_FILE, "r") as f:
+            return f.read().strip().encode("utf-8")
+    except FileNotFoundError:
+        return None
+
+
+def empty_state():
+    return {
+        "total_now": 0,
+        "zones_now": {},
+        "alerts": [],
+        "people": {},
+        "engine_online": False,
+    }
+
+
+class StateSnapshot:
+    """
+    Immutable, already-encoded state. Built once by the producer and
+    handed out as-is, so readers never take a lock or re-run json.
+    body: JSON bytes, gzip_body: gzip of body (or None if small),
+    etag: hash of body
+    """
+    __slots__ = ("body", "gzip_body", "etag")
+
+    def __init__(self, state):
+        body = json.dumps(state, separators=(",", ":")).encode("utf-8")
+        self.body = body
+        self.gzip_body = None
+        if len(body) >= GZIP_MIN_SIZE:
+            self.gzip_body = gzip.compress(body, compresslevel=5, mtime=0)
+        self.etag = hashlib.blake2b(body, digest_size=8).hexdigest()
+
+    @classmethod
+    def from_parts(cls, etag, body, gzip_body):
+        """Rebuild a snapshot received over the wire, without re-encoding."""
+        snapshot = cls.__new__(cls)
+        snapshot.etag = etag
+        snapshot.body = body
+        snapshot.gzip_body = gzip_body
+        return snapshot
+
+
+OFFLINE_SNAPSHOT = StateSnapshot(empty_state())
+
+# Snapshots are served per channel:
+#   "state": live counts for /get_state and the dashboard
+#   "rates": per-camera scheduler report for the admin page; kept apart
+#            because it changes every frame and would defeat the state ETag
+OFFLINE_SNAPSHOTS = {
+    "state": OFFLINE_SNAPSHOT,
+    "rates": StateSnapshot({}),
+}
+
+
+class StatePublisher:
+    """
+    Engine side. Encodes each new state into a StateSnapshot once and
+    answers requests from any number of web workers, each on its own
+    connection. A request is b"<channel>:<client's current etag>"; the
+    reply is either b"" (unchanged) or three messages: etag, body, gzip body.
+    """
+
+    def __init__(self, address=None):
+        self.address = address or get_address()
+        self._snapshots = dict(OFFLINE_SNAPSHOTS)
+        self._listener = None
+        self._inode = None  # of the socket file this process created
+
+    def publish(self, state, channel="state"):
+        if channel == "state":
+            state = dict(state, engine_online=True)
+        snapshot = StateSnapshot(state)
+        if snapshot.etag != self._snapshots[channel].etag:
+            # single reference swap; handler threads read it without a lock
+            self._snapshots[channel] = snapshot
+
+    def _check_not_running(self, key):
+        """Refuse to take over the address while another engine serves it."""
+        try:
+            conn = Client(self.address, authkey=key)
+        except AuthenticationError:
+            pass  # something is listening, with another key
+        except OSError:
+            return  # nobody there; a socket file may be left over
+        else:
+            conn.close()
+        raise RuntimeError(f"engine already running on {self.address}")
+
+    def start(self):
+        key = load_key(create=True)
+        self._check_not_running(key)
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            # left over from an engine that did not shut down cleanly
+            os.unlink(self.address)
+        self._listener = Listener(self.address, authkey=key)
+        if isinstance(self.address, str):
+            self._inode = os.stat(self.address).st_ino
+            # Listener unlinks its path on close / at exit even when another
+            # engine owns it by then; close() below only removes our own file
+            unlink = getattr(self._listener._listener, "_unlink", None)
+            if unlink is not None:
+                unlink.cancel()
+                self._listener._listener._unlink = None
+        t = threading.Thread(target=self._accept_loop, daemon=True)
+        t.start()
+        print("State publisher listening on", self.address)
+        return self
+
+    def _accept_loop(self):
+        listener = self._listener
+        while self._listener is listener:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                if self._listener is not listener:
+                    break  # closed
+                # bad authkey, client gone mid-handshake, ...
+                print("IPC accept failed:", e)
+                continue
+            t = threading.Thread(target=self._serve, args=(conn,), daemon=True)
+            t.start()
+
+    def _serve(self, conn):
+        try:
+            while True:
+                request = conn.recv_bytes(256).decode("ascii", "replace")
+                if self._listener is None:
+                    break  # publisher closed
+                channel, _, known_etag = request.partition(":")
+                snapshot = self._snapshots.get(channel)
+                if snapshot is None or known_etag == snapshot.etag:
+                    conn.send_bytes(b"")
+                else:
+                    conn.send_bytes(snapshot.etag.encode("ascii"))
+                    conn.send_bytes(snapshot.body)
+                    conn.send_bytes(snapshot.gzip_body or b"")
+        except (EOFError, OSError):
+            pass  # web worker went away (or sent an oversized request)
+        finally:
+            conn.close()
+
+    def close(self):
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            listener.close()
+        inode, self._inode = self._inode, None
+        if inode is not None:
+            try:
+                if os.stat(self.address).st_ino == inode:
+                    os.unlink(self.address)
+            except FileNotFoundError:
+                pass
+
+
+class StateClient:
+    """
+    Web side. Keeps one connection per worker process and reconnects
+    when the engine restarts; while it is down, OFFLINE_SNAPSHOTS are served.
+
+    snapshot() never blocks on another request: one thread refreshes at
+    most every MAX_AGE seconds, everybody else gets the current snapshot.
+    """
+
+    def __init__(self, address=None, max_age=MAX_AGE):
+        self.address = address or get_address()
+        self.max_age = max_age
+        self._conn = None
+        self._pid = None
+        self._next_retry = 0.0
+        self._snapshots = dict(OFFLINE_SNAPSHOTS)
+        self._fetched_at = {}
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        # a connection inherited across fork() must not be shared
+        if self._conn is not None and self._pid == os.getpid():
+            return self._conn
+        self._conn = None
+        now = time.monotonic()
+        if now < self._next_retry:
+            return None
+        try:
+            key = load_key()
+            if key is None:
+                raise FileNotFoundError(KEY_FILE)  # engine never started
+            self._conn = Client(self.address, authkey=key)
+            self._pid = os.getpid()
+        except Exception:
+            self._next_retry = now + RETRY_INTERVAL
+        return self._conn
+
+    def _drop(self):
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except OSError:
+                pass
+        self._conn = None
+
+    def _fetch(self, channel):
+        current = self._snapshots[channel]
+        # second attempt covers a dead connection to a restarted engine
+        for _ in range(2):
+            conn = self._connect()
+            if conn is None:
+                break
+            try:
+                conn.send_bytes(f"{channel}:{current.etag}".encode("ascii"))
+                etag = conn.recv_bytes(MAX_MESSAGE)
+                if not etag:
+                    return current  # unchanged
+                body = conn.recv_bytes(MAX_MESSAGE)
+                gzip_body = conn.recv_bytes(MAX_MESSAGE) or None
+                return StateSnapshot.from_parts(etag.decode("ascii"), body, gzip_body)
+            except (EOFError, OSError):
+                self._drop()
+        return OFFLINE_SNAPSHOTS[channel]
+
+    def snapshot(self, channel="state"):
+        snapshot = self._snapshots[channel]
+        if time.monotonic() - self._fetched_at.get(channel, 0.0) < self.max_age:
+            return snapshot
+        if not self._lock.acquire(blocking=False):
+            return snapshot  # someone else is refreshing
+        try:
+            self._snapshots[channel] = self._fetch(channel)
+            self._fetched_at[channel] = time.monotonic()
+            return self._snapshots[channel]
+        finally:
+            self._lock.release()
@@ -36,7 +36,7 @@ def main():
     print("Controls:")
     print("  Draw zone: Left-click and drag on window")
     print("  s : save zones")
-    print("  d : delete zone (then press zone id digit)")
+    print("  d : delete zone (then type zone id, Enter to confirm)")
     print("  q : quit")
 
     delete_mode = False
@@ -65,16 +65,22 @@ def main():
         elif key == ord('s'):
             save_zones()
 
-        elif key == ord('d'):
-            print("Delete mode: press zone id digit (e.g., 1,2,3)")
+        elif key == ord('d') and not delete_mode:
+            print("Delete mode: type zone id (e.g., 3 or 12), Enter to confirm, ESC to cancel")
             delete_mode = True
-            pending_delete_id = None
+            pending_delete_id = ""
 
         elif delete_mode:
-            # expecting a digit key for zone id
+            # collect digits until Enter; ids keep growing, so may be > 9
             if ord('0') <= key <= ord('9'):
-                zone_id = int(chr(key))
-                delete_zone_by_id(zone_id)
+                pending_delete_id += chr(key)
+                print("Zone id:", pending_delete_id)
+            elif key in (8, 127) and pending_delete_id:  # backspace
+                pending_delete_id = pending_delete_id[:-1]
+                print("Zone id:", pending_delete_id)
+            elif key in (10, 13):  # Enter
+                if pending_delete_id:
+                    delete_zone_by_id(int(pending_delete_id))
                 delete_mode = False
                 pending_delete_id = None
             elif key == 27:  # ESC to cancel delete mode
@@ -0,0 +1,112 @@
+# models.py
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.exc import IntegrityError, OperationalError
+from werkzeug.security import generate_password_hash
+
+# shared by the web tier (app.py) and the inference engine (engine.py)
+db = SQLAlchemy()
+
+DATABASE_URI = "sqlite:///crowd.db"
+
+# ----------------- DB MODELS -----------------
+class User(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    username = db.Column(db.String(64), unique=True)
+    password_hash = db.Column(db.String(256))
+    role = db.Column(db.String(16))  # "admin" or "user"
+
+class Camera(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(128))
+    source_type = db.Column(db.String(16))  # "webcam" or "video"
+    source_path = db.Column(db.String(256), nullable=True)
+    active = db.Column(db.Boolean, default=True)
+    # inference scheduling (see scheduler.py)
+    target_fps = db.Column(db.Float, default=5.0)
+    min_fps = db.Column(db.Float, default=1.0)
+    priority = db.Column(db.Integer, default=1)  # higher = shed last
+
+class ZoneMeta(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    zone_id = db.Column(db.Integer)  # matches zones.json id
+    name = db.Column(db.String(128))
+    threshold = db.Column(db.Integer, default=50)
+
+class CountLog(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    timestamp = db.Column(db.DateTime)
+    camera_id = db.Column(db.Integer, nullable=True)
+    zone_id = db.Column(db.Integer)
+    count = db.Column(db.Integer)
+
+class AlertLog(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    timestamp = db.Column(db.DateTime)
+    camera_id = db.Column(db.Integer, nullable=True)
+    zone_id = db.Column(db.Integer)
+    count = db.Column(db.Integer)
+    threshold = db.Column(db.Integer)
+    message = db.Column(db.String(256))
+
+
+# columns added after the first release; create_all() does not add
+# columns to existing tables, so older crowd.db files get them here
+ADDED_COLUMNS = {
+    "camera": {
+        "target_fps": "FLOAT DEFAULT 5.0",
+        "min_fps": "FLOAT DEFAULT 1.0",
+        "priority": "INTEGER DEFAULT 1",
+    },
+    "count_log": {"camera_id": "INTEGER"},
+    "alert_log": {"camera_id": "INTEGER"},
+}
+
+def _add_missing_columns():
+    inspector = db.inspect(db.engine)
+    for table, columns in ADDED_COLUMNS.items():
+        existing = {c["name"] for c in inspector.get_columns(table)}
+        for name, ddl in columns.items():
+            if name not in existing:
+                try:
+                    db.session.execute(db.text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+                    db.session.commit()
+                except OperationalError as e:
+                    # the engine and every web worker migrate at startup;
+                    # whoever comes second finds the column already there
+                    db.session.rollback()
+                    if "duplicate column" not in str(e).lower():
+                        raise
+
+
+def init_db(app):
+    """
+    Bind db to a Flask app, create tables and the default admin.
+    Safe to run from the engine and several web workers at once.
+    """
+    app.config["SQLALCHEMY_DATABASE_URI"] = DATABASE_URI
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    db.init_app(app)
+
+    with app.app_context():
+        # another process may create a table between check and CREATE;
+        # each retry only creates what is still missing
+        for attempt in range(len(db.metadata.tables)):
+            try:
+                db.create_all()
+                break
+            except OperationalError:
+                db.session.rollback()
+                if attempt == len(db.metadata.tables) - 1:
+                    raise
+        _add_missing_columns()
+        if not User.query.filter_by(username="admin").first():
+            admin_user = User(
+                username="admin",
+                password_hash=generate_password_hash("admin123"),
+                role="admin"
+            )
+            db.session.add(admin_user)
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()  # another process added it first
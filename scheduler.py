@@ -0,0 +1,199 @@
+# scheduler.py
+# Central inference scheduler: detection workers (one per camera) share a
+# single model / CPU, so each worker asks for a turn before running YOLO.
+import threading
+import time
+from collections import deque
+
+UTILIZATION = 0.9    # share of wall time the scheduler plans to spend on inference
+SHED_FPS = 0.1       # rate left to a fully shed camera, so it still reports
+RATE_WINDOW = 5.0    # seconds of history used for the achieved rate
+
+
+class CameraSlot:
+    """Scheduling state for one camera."""
+
+    def __init__(self, cam_id, name, target_fps, min_fps, priority):
+        self.cam_id = cam_id
+        self.name = name
+        self.target_fps = target_fps
+        self.min_fps = min_fps
+        self.priority = priority
+        self.allowed_fps = target_fps
+        self.cost = None             # EMA seconds per inference
+        self.next_due = 0.0
+        self.waiting = False
+        self.starts = deque(maxlen=200)
+
+    def achieved_fps(self, now):
+        while self.starts and now - self.starts[0] > RATE_WINDOW:
+            self.starts.popleft()
+        if len(self.starts) < 2:
+            return 0.0
+        span = max(now - self.starts[0], self.starts[-1] - self.starts[0])
+        return (len(self.starts) - 1) / span if span > 0 else 0.0
+
+
+class InferenceScheduler:
+    """
+    Hands out one inference turn at a time.
+
+    Each camera has a target rate, a minimum rate and a priority (higher
+    is more important). From the measured cost per inference the
+    scheduler plans how much of the CPU every camera may use: first the
+    minimum rates in priority order, then the rest up to the targets,
+    again highest priority first. When inference falls behind, the lowest
+    priority cameras are therefore degraded first, down to their minimum
+    and only then below it.
+
+    Usage in a worker:
+        if not scheduler.acquire(cam_id):
+            return  # stopped
+        try:
+            ... inference ...
+        finally:
+            scheduler.release(cam_id, elapsed)
+    """
+
+    def __init__(self, utilization=UTILIZATION):
+        self.utilization = utilization
+        self._slots = {}
+        self._busy = False
+        self._stopped = False
+        self._cond = threading.Condition()
+
+    def configure(self, cam_id, name, target_fps, min_fps, priority):
+        """Add a camera or update its settings (safe while running)."""
+        target_fps = max(float(target_fps), 0.1)
+        min_fps = min(max(float(min_fps), 0.0), target_fps)
+        with self._cond:
+            slot = self._slots.get(cam_id)
+            if slot is None:
+                slot = CameraSlot(cam_id, name, target_fps, min_fps, int(priority))
+                self._slots[cam_id] = slot
+            else:
+                slot.name = name
+                slot.target_fps = target_fps
+                slot.min_fps = min_fps
+                slot.priority = int(priority)
+            self._rebalance()
+            self._cond.notify_all()
+
+    def remove(self, cam_id):
+        with self._cond:
+            self._slots.pop(cam_id, None)
+            self._rebalance()
+            self._cond.notify_all()
+
+    def _rebalance(self):
+        budget = self.utilization  # seconds of inference per second
+        ordered = sorted(self._slots.values(), key=lambda s: (-s.priority, s.cam_id))
+        for s in ordered:
+            s.allowed_fps = 0.0
+
+        # minimum rates first, then top up towards the targets
+        for field in ("min_fps", "target_fps"):
+            for s in ordered:
+                want = getattr(s, field) - s.allowed_fps
+                if want <= 0:
+                    continue
+                if not s.cost:
+                    give = want  # not measured yet: assume it fits
+                else:
+                    give = min(want, max(budget, 0.0) / s.cost)
+                s.allowed_fps += give
+                budget -= give * (s.cost or 0.0)
+
+        for s in ordered:
+            s.allowed_fps = max(s.allowed_fps, SHED_FPS)
+
+    def frame_budget(self, cam_id):
+        """
+        Seconds of inference one frame of cam_id may cost, taken from the
+        same central budget the rates are planned from; the tiled
+        detector picks its grid to fit this.
+
+        Overloaded: the CPU share the camera actually gets, spread over
+        its target rate, so low-priority cameras pick coarser tiles and
+        can climb back to their target instead of being cut in rate.
+        Spare capacity: handed out in proportion to priority.
+        None until every camera has a measured cost.
+        """
+        with self._cond:
+            slot = self._slots.get(cam_id)
+            slots = list(self._slots.values())
+            if slot is None or any(s.cost is None for s in slots):
+                return None
+            spare = self.utilization - sum(s.target_fps * s.cost for s in slots)
+            if spare <= 0:
+                share = slot.allowed_fps * slot.cost
+            else:
+                weight = sum(max(s.priority, 1) for s in slots)
+                share = slot.target_fps * slot.cost + spare * max(slot.priority, 1) / weight
+            return share / slot.target_fps
+
+    def _pick(self, now):
+        due = [s for s in self._slots.values() if s.waiting and s.next_due <= now]
+        if not due:
+            return None
+        # highest priority first, then whoever has waited longest
+        return min(due, key=lambda s: (-s.priority, s.next_due))
+
+    def acquire(self, cam_id):
+        """Block until cam_id may run inference. False once stopped."""
+        with self._cond:
+            slot = self._slots[cam_id]
+            slot.waiting = True
+            try:
+                while not self._stopped:
+                    now = time.monotonic()
+                    if not self._busy and self._pick(now) is slot:
+                        self._busy = True
+                        period = 1.0 / slot.allowed_fps
+                        # start-to-start spacing; a late camera may catch
+                        # up by at most one period instead of bursting
+                        slot.next_due = max(slot.next_due, now - period) + period
+                        slot.starts.append(now)
+                        return True
+                    timeout = 0.5
+                    if slot.next_due > now:
+                        timeout = min(timeout, slot.next_due - now)
+                    self._cond.wait(timeout)
+                return False
+            finally:
+                slot.waiting = False
+
+    def release(self, cam_id, elapsed):
+        """Give the turn back; elapsed = seconds the inference took."""
+        with self._cond:
+            self._busy = False
+            slot = self._slots.get(cam_id)
+            if slot is not None:
+                if slot.cost is None:
+                    slot.cost = elapsed
+                else:
+                    slot.cost = 0.8 * slot.cost + 0.2 * elapsed
+                self._rebalance()
+            self._cond.notify_all()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def report(self):
+        """{cam_id: {...}} achieved vs. target rate, for the live state."""
+        now = time.monotonic()
+        with self._cond:
+            return {
+                str(s.cam_id): {
+                    "name": s.name,
+                    "priority": s.priority,
+                    "target_fps": round(s.target_fps, 2),
+                    "min_fps": round(s.min_fps, 2),
+                    "allowed_fps": round(s.allowed_fps, 2),
+                    "achieved_fps": round(s.achieved_fps(now), 2),
+                    "cost_ms": round((s.cost or 0.0) * 1000, 1),
+                }
+                for s in self._slots.values()
+            }
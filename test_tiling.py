@@ -0,0 +1,120 @@
+# test_tiling.py
+import numpy as np
+
+from tiling import make_tiles, merge_boxes, choose_tile_size, tile_count
+
+
+# ----------------- make_tiles -----------------
+def test_tiles_cover_frame_and_stay_inside():
+    tiles = make_tiles(1920, 1080, 640, overlap=0.2)
+    assert all(0 <= x1 < x2 <= 1920 and 0 <= y1 < y2 <= 1080 for x1, y1, x2, y2 in tiles)
+    assert all(x2 - x1 == 640 and y2 - y1 == 640 for x1, y1, x2, y2 in tiles)
+    covered = np.zeros((1080, 1920), dtype=bool)
+    for x1, y1, x2, y2 in tiles:
+        covered[y1:y2, x1:x2] = True
+    assert covered.all()
+
+
+def test_tiles_last_row_and_column_aligned_to_edge():
+    tiles = make_tiles(1920, 1080, 640, overlap=0.2)
+    assert max(x2 for _, _, x2, _ in tiles) == 1920
+    assert max(y2 for _, _, _, y2 in tiles) == 1080
+
+
+def test_tiles_neighbours_overlap():
+    xs = sorted({x1 for x1, _, _, _ in make_tiles(1920, 640, 640, overlap=0.2)})
+    assert all(b - a <= 512 for a, b in zip(xs, xs[1:]))
+
+
+def test_tile_larger_than_frame_gives_one_full_tile():
+    assert make_tiles(400, 300, 640) == [(0, 0, 400, 300)]
+
+
+def test_tiles_clamped_per_axis():
+    # wide, short frame: tile height is clamped to the frame height
+    tiles = make_tiles(1920, 480, 640)
+    assert all(y1 == 0 and y2 == 480 for _, y1, _, y2 in tiles)
+
+
+def test_tiles_restricted_to_regions():
+    tiles = make_tiles(1920, 1080, 640, overlap=0.2, regions=[(0, 0, 100, 100)])
+    assert tiles == [(0, 0, 640, 640)]
+    assert make_tiles(1920, 1080, 640, regions=[]) == make_tiles(1920, 1080, 640)
+
+
+def test_tiles_region_touching_edge_is_not_overlapping():
+    # half-open intersection: a region ending exactly at a tile start does not select it
+    tiles = make_tiles(1280, 640, 640, overlap=0.0, regions=[(600, 0, 640, 10)])
+    assert tiles == [(0, 0, 640, 640)]
+
+
+# ----------------- merge_boxes -----------------
+def test_merge_empty_and_single():
+    b, s = merge_boxes([], [])
+    assert b.shape == (0, 4) and s.shape == (0,)
+    b, s = merge_boxes([[1, 2, 3, 4]], [0.5])
+    assert b.tolist() == [[1, 2, 3, 4]]
+
+
+def test_merge_duplicates_keeps_best():
+    boxes = [[0, 0, 100, 200], [2, 1, 101, 199], [300, 300, 350, 400]]
+    b, s = merge_boxes(boxes, [0.8, 0.9, 0.7])
+    assert b.tolist() == [[2, 1, 101, 199], [300, 300, 350, 400]]
+    assert np.allclose(s, [0.9, 0.7])
+
+
+def test_merge_keeps_small_person_inside_big_box_when_uncut():
+    boxes = [[0, 0, 100, 200], [30, 30, 50, 60]]
+    b, _ = merge_boxes(boxes, [0.9, 0.8])
+    assert len(b) == 2
+
+
+def test_merge_cut_box_folds_into_whole_box():
+    # seam-cut upper half of the same person: IoU 0.5 is borderline, IoS is 1
+    boxes = [[0, 0, 100, 200], [0, 0, 100, 90]]
+    b, _ = merge_boxes(boxes, [0.9, 0.8], cut=[False, True])
+    assert b.tolist() == [[0, 0, 100, 200]]
+    b, _ = merge_boxes(boxes, [0.9, 0.8])
+    assert len(b) == 2
+
+
+def test_merge_prefers_whole_box_over_higher_scored_cut_box():
+    boxes = [[0, 0, 100, 120], [0, 0, 100, 200]]
+    b, s = merge_boxes(boxes, [0.95, 0.9], cut=[True, False])
+    assert b.tolist() == [[0, 0, 100, 200]]
+    assert np.isclose(s[0], 0.95)
+
+
+def test_merge_wbf_ignores_cut_members_when_whole_box_exists():
+    boxes = [[0, 0, 100, 200], [0, 0, 100, 120], [4, 2, 104, 202]]
+    b, _ = merge_boxes(boxes, [0.9, 0.95, 0.9], method="wbf", cut=[False, True, False])
+    assert np.allclose(b, [[2, 1, 102, 201]])
+
+
+def test_merge_wbf_weights_by_score():
+    boxes = [[0, 0, 100, 100], [10, 0, 110, 100]]
+    b, _ = merge_boxes(boxes, [0.75, 0.25], method="wbf", threshold=0.5)
+    assert np.allclose(b, [[2.5, 0, 102.5, 100]])
+
+
+# ----------------- choose_tile_size -----------------
+def test_choose_smallest_tile_that_fits_budget():
+    # 512 px tiles: 5x3 grid + full frame = 16 images; 640 px: 4x2 + 1 = 9
+    assert tile_count(1920, 1080, 512) == 15
+    assert tile_count(1920, 1080, 640) == 8
+    assert choose_tile_size(1920, 1080, 0.01, 0.165) == 512
+    assert choose_tile_size(1920, 1080, 0.01, 0.155) == 640
+
+
+def test_choose_none_when_nothing_fits():
+    assert choose_tile_size(1920, 1080, 1.0, 0.1) is None
+
+
+def test_choose_none_when_frame_smaller_than_tiles():
+    assert choose_tile_size(480, 360, 0.001, 10.0) is None
+
+
+def test_choose_without_full_frame_pass():
+    # 8 tiles fit, 8 + the extra full-frame image do not
+    assert choose_tile_size(1920, 1080, 0.01, 0.085, full_frame=False, sizes=(640,)) == 640
+    assert choose_tile_size(1920, 1080, 0.01, 0.085, full_frame=True, sizes=(640,)) is None
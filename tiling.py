@@ -0,0 +1,253 @@
+# tiling.py
+# Tiled inference for dense / distant crowds: the frame is cut into
+# overlapping tiles, all tiles go through YOLO in one batched predict()
+# call, and boxes are merged back across tile seams.
+import math
+import time
+
+import numpy as np
+
+MODEL_IMGSZ = 640                        # what each tile is resized to
+TILE_SIZES = (512, 640, 800, 960, 1280)  # candidate tile sizes, in source pixels
+
+
+def make_tiles(frame_w, frame_h, tile_size, overlap=0.2, regions=None):
+    """
+    Cover the frame with tile_size x tile_size tiles overlapping by
+    `overlap` (fraction of tile_size). The last row/column is aligned to
+    the frame edge, so tiles never go outside the frame.
+    regions: optional list of (x1, y1, x2, y2); only tiles touching one
+             of them are kept (e.g. the configured zones).
+    Returns: list of (x1, y1, x2, y2)
+    """
+    def starts(length):
+        size = min(tile_size, length)
+        if length <= size:
+            return [0], size
+        step = max(1, int(size * (1 - overlap)))
+        n = math.ceil((length - size) / step) + 1
+        return [min(i * step, length - size) for i in range(n)], size
+
+    xs, tw = starts(frame_w)
+    ys, th = starts(frame_h)
+    tiles = [(x, y, x + tw, y + th) for y in ys for x in xs]
+
+    if regions:
+        tiles = [t for t in tiles
+                 if any(t[0] < r[2] and r[0] < t[2] and t[1] < r[3] and r[1] < t[3]
+                        for r in regions)]
+    return tiles
+
+
+def tile_count(frame_w, frame_h, tile_size, overlap=0.2):
+    return len(make_tiles(frame_w, frame_h, tile_size, overlap))
+
+
+def _pairwise_overlap(boxes, cut=None):
+    """
+    boxes: (N, 4) array. Returns (N, N) overlap matrix.
+    Normally intersection over union. For pairs where a box was cut by a
+    tile seam (cut[i] True) intersection over the smaller box is used:
+    the cut-off part lies mostly inside the full detection, so IoS merges
+    it where IoU would not. Whole boxes keep IoU so a small person in
+    front of / behind a big one is not swallowed.
+    """
+    x1 = np.maximum(boxes[:, None, 0], boxes[None, :, 0])
+    y1 = np.maximum(boxes[:, None, 1], boxes[None, :, 1])
+    x2 = np.minimum(boxes[:, None, 2], boxes[None, :, 2])
+    y2 = np.minimum(boxes[:, None, 3], boxes[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    iou = inter / np.maximum(area[:, None] + area[None, :] - inter, 1e-6)
+    if cut is None or not cut.any():
+        return iou
+    ios = inter / np.maximum(np.minimum(area[:, None], area[None, :]), 1e-6)
+    return np.where(cut[:, None] | cut[None, :], ios, iou)
+
+
+def merge_boxes(boxes, scores, threshold=0.5, method="nms", cut=None):
+    """
+    Merge duplicate detections coming from overlapping tiles.
+    method "nms": keep the best box of each cluster
+    method "wbf": score-weighted average of each cluster (weighted box fusion)
+    cut: optional bool per box, True if it touches an inner tile seam.
+         Whole boxes rank before cut ones whatever their score, so a
+         cluster is represented by a whole box when it has one; a cut box
+         would shift the centroid and can land the person in another zone.
+    Returns: (boxes, scores) as arrays; a cluster's score is its best score
+    """
+    boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+    if len(boxes) < 2:
+        return boxes, scores
+
+    if cut is None:
+        cut = np.zeros(len(boxes), dtype=bool)
+    cut = np.asarray(cut, dtype=bool).reshape(-1)
+    order = np.lexsort((-scores, cut))  # uncut first, then by score
+    boxes, scores, cut = boxes[order], scores[order], cut[order]
+    overlap = _pairwise_overlap(boxes, cut) >= threshold
+
+    alive = np.ones(len(boxes), dtype=bool)
+    out_boxes, out_scores = [], []
+    for i in range(len(boxes)):
+        if not alive[i]:
+            continue
+        cluster = overlap[i] & alive
+        alive &= ~cluster
+        if method == "wbf":
+            # fuse only whole boxes if the cluster has any
+            members = cluster & ~cut if not cut[i] else cluster
+            w = scores[members]
+            out_boxes.append((boxes[members] * w[:, None]).sum(axis=0) / w.sum())
+        else:
+            out_boxes.append(boxes[i])
+        out_scores.append(scores[cluster].max())
+    return np.array(out_boxes, dtype=np.float32), np.array(out_scores, dtype=np.float32)
+
+
+def _touches_seam(xyxy, tile, frame_w, frame_h, margin=2):
+    """Per box: True if it touches a tile edge that is not a frame edge."""
+    tx1, ty1, tx2, ty2 = tile
+    cut = np.zeros(len(xyxy), dtype=bool)
+    if tx1 > 0:
+        cut |= xyxy[:, 0] <= tx1 + margin
+    if ty1 > 0:
+        cut |= xyxy[:, 1] <= ty1 + margin
+    if tx2 < frame_w:
+        cut |= xyxy[:, 2] >= tx2 - margin
+    if ty2 < frame_h:
+        cut |= xyxy[:, 3] >= ty2 - margin
+    return cut
+
+
+def choose_tile_size(frame_w, frame_h, per_image_sec, budget_sec,
+                     overlap=0.2, full_frame=True, sizes=TILE_SIZES):
+    """
+    Cost model: every tile costs about the same (it is resized to
+    MODEL_IMGSZ), so a grid costs n_tiles * per_image_sec. Pick the
+    smallest tile size (= most detail) whose grid fits the budget.
+    Returns None when even the coarsest grid does not fit (-> no tiling).
+    """
+    extra = 1 if full_frame else 0
+    for size in sorted(sizes):
+        if size >= max(frame_w, frame_h):
+            break  # one tile = whole frame, tiling buys nothing
+        n = tile_count(frame_w, frame_h, size, overlap) + extra
+        if n * per_image_sec <= budget_sec:
+            return size
+    return None
+
+
+class TiledDetector:
+    """
+    Person detector with an optional tiled mode.
+
+    tile_size:  fixed tile size in source pixels, or None to let the cost
+                model pick one from the measured speed and `target_fps`
+    overlap:    tile overlap, fraction of tile_size
+    zones_only: only run tiles touching the zone rects passed to detect()
+    full_frame: also run the whole frame in the same batch, for people
+                too large to fit in one tile
+    budget:     fraction of the 1/target_fps frame time inference may use
+
+    frame_budget (attribute): seconds of inference per frame, set from
+    outside (engine.py sets it from the scheduler's central budget every
+    frame); when None, budget / target_fps is used.
+    """
+
+    def __init__(self, model, tiled=True, tile_size=None, overlap=0.2,
+                 zones_only=False, full_frame=True, target_fps=5.0,
+                 budget=0.8, conf=0.4, merge_method="nms",
+                 merge_threshold=0.5, reselect_every=50):
+        self.model = model
+        self.tiled = tiled
+        self.fixed_tile_size = tile_size
+        self.overlap = overlap
+        self.zones_only = zones_only
+        self.full_frame = full_frame
+        self.target_fps = target_fps
+        self.budget = budget
+        self.conf = conf
+        self.merge_method = merge_method
+        self.merge_threshold = merge_threshold
+        self.reselect_every = reselect_every
+
+        self.tile_size = tile_size
+        self.frame_budget = None
+        self.per_image_sec = None  # EMA of inference time per image
+        self._frames = 0
+        self._next_reselect = 2    # first frame is only used to measure
+
+    def _predict(self, images):
+        t0 = time.perf_counter()
+        results = self.model.predict(images, classes=[0], conf=self.conf,
+                                     imgsz=MODEL_IMGSZ, verbose=False)
+        per_image = (time.perf_counter() - t0) / len(images)
+        if self.per_image_sec is None:
+            self.per_image_sec = per_image
+        else:
+            self.per_image_sec = 0.9 * self.per_image_sec + 0.1 * per_image
+        return results
+
+    def _update_tile_size(self, frame_w, frame_h):
+        if self.fixed_tile_size is not None or self.per_image_sec is None:
+            return
+        if self._frames < self._next_reselect:
+            return
+        self._next_reselect = self._frames + self.reselect_every
+        budget_sec = self.frame_budget
+        if budget_sec is None:
+            budget_sec = self.budget / max(self.target_fps, 0.1)
+        size = choose_tile_size(frame_w, frame_h, self.per_image_sec, budget_sec,
+                                self.overlap, self.full_frame)
+        if size != self.tile_size:
+            print(f"Tiling: {frame_w}x{frame_h} -> tile size {size} "
+                  f"({self.per_image_sec * 1000:.0f} ms/image)")
+            self.tile_size = size
+
+    def detect(self, frame, zone_rects=None):
+        """
+        frame: BGR image
+        zone_rects: list of (x1, y1, x2, y2), used when zones_only is set
+        returns: list of (x1, y1, x2, y2) ints
+        """
+        frame_h, frame_w = frame.shape[:2]
+        self._frames += 1
+        self._update_tile_size(frame_w, frame_h)
+
+        tiles = []
+        if self.tiled and self.tile_size is not None:
+            regions = zone_rects if self.zones_only else None
+            tiles = make_tiles(frame_w, frame_h, self.tile_size, self.overlap, regions)
+
+        if not tiles:
+            results = self._predict([frame])
+            xyxy = results[0].boxes.xyxy.cpu().numpy()
+            return [tuple(int(v) for v in b) for b in xyxy]
+
+        images = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in tiles]
+        if self.full_frame:
+            tiles.append((0, 0, frame_w, frame_h))
+            images.append(frame)
+
+        # one batched call for every tile
+        results = self._predict(images)
+
+        all_boxes, all_scores, all_cut = [], [], []
+        for tile, r in zip(tiles, results):
+            xyxy = r.boxes.xyxy.cpu().numpy()
+            if len(xyxy) == 0:
+                continue
+            ox, oy = tile[0], tile[1]
+            xyxy = xyxy + np.array([ox, oy, ox, oy], dtype=xyxy.dtype)
+            all_boxes.append(xyxy)
+            all_scores.append(r.boxes.conf.cpu().numpy())
+            all_cut.append(_touches_seam(xyxy, tile, frame_w, frame_h))
+        if not all_boxes:
+            return []
+
+        boxes, _ = merge_boxes(np.concatenate(all_boxes), np.concatenate(all_scores),
+                               self.merge_threshold, self.merge_method,
+                               np.concatenate(all_cut))
+        return [tuple(int(v) for v in b) for b in boxes]
@@ -1,9 +1,13 @@
 # zones.py
-import cv2
+# cv2 is imported inside the drawing / mouse helpers only, so the web tier
+# (app.py) can read zones.json without pulling in OpenCV.
 import json
 import os
+import threading
 
 zones = []          # list of dicts: {"id": int, "x1":..,"y1":..,"x2":..,"y2":..}
+                    # optional "camera_id": zone belongs to that camera;
+                    # zones without one belong to the primary camera
 drawing = False
 ix, iy = -1, -1
 current_frame = None
@@ -11,34 +15,46 @@ next_zone_id = 1
 
 ZONES_FILE = "zones.json"
 
+def _read_file(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+def read_zones_file(path=ZONES_FILE):
+    """Read zones from disk without touching the editor globals."""
+    return _read_file(path).get("zones", [])
+
 def load_zones():
     global zones, next_zone_id
-    if not os.path.exists(ZONES_FILE):
-        zones = []
-        next_zone_id = 1
-        return zones
-
-    with open(ZONES_FILE, "r") as f:
-        data = json.load(f)
-        zones = data.get("zones", [])
-    
-    # FIX: Find next available ID starting from 1
-    used_ids = {z["id"] for z in zones}
-    next_zone_id = 1
-    while next_zone_id in used_ids:
-        next_zone_id += 1
-    
+    data = _read_file(ZONES_FILE)
+    zones = data.get("zones", [])
+
+    # IDs are never reused: CountLog / ZoneMeta rows refer to them, so the
+    # counter is stored in zones.json and survives deleting the last zone
+    next_zone_id = max(
+        data.get("next_zone_id", 1),
+        max((z["id"] for z in zones), default=0) + 1
+    )
+
     return zones
 
 def save_zones():
-    data = {"zones": zones}
-    with open(ZONES_FILE, "w") as f:
+    data = {"next_zone_id": next_zone_id, "zones": zones}
+    # write to a temp file and swap it in, so a running ZoneWatcher
+    # never reads a half-written zones.json
+    tmp_path = ZONES_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
         json.dump(data, f, indent=4)
+    os.replace(tmp_path, ZONES_FILE)
     print("✓ Zones saved to", ZONES_FILE)
 
-def draw_all_zones(frame):
+def draw_all_zones(frame, zone_list=None):
     """Draw all zones and labels on given frame."""
-    for z in zones:
+    import cv2
+    if zone_list is None:
+        zone_list = zones
+    for z in zone_list:
         x1, y1, x2, y2 = z["x1"], z["y1"], z["x2"], z["y2"]
         cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
         label = f"Zone {z['id']}"
@@ -54,6 +70,7 @@ def mouse_draw_rectangle(event, x, y, flags, param):
     Left button up: finalize and store zone
     """
     global ix, iy, drawing, current_frame, zones, next_zone_id
+    import cv2
 
     if event == cv2.EVENT_LBUTTONDOWN:
         drawing = True
@@ -81,7 +98,7 @@ def mouse_draw_rectangle(event, x, y, flags, param):
         cv2.imshow("CrowdCount M1", temp)
 
 def delete_zone_by_id(zone_id):
-    global zones, next_zone_id
+    global zones
     before = len(zones)
     zones = [z for z in zones if z["id"] != zone_id]
     after = len(zones)
@@ -89,12 +106,128 @@ def delete_zone_by_id(zone_id):
         print(f"No zone with id {zone_id} found.")
     else:
         print(f"Zone {zone_id} deleted.")
-        # Renumber remaining zones to start from 1
-        for i, z in enumerate(zones):
-            z["id"] = i + 1
-        # Update next_zone_id
-        if zones:
-            next_zone_id = max(z["id"] for z in zones) + 1
-        else:
-            next_zone_id = 1
-        save_zones()  # auto-save after delete
\ No newline at end of file
+        # remaining zones keep their ids (history in CountLog uses them)
+        # and next_zone_id is left alone so the id is not handed out again
+        save_zones()  # auto-save after delete
+
+
+# ----------------- LIVE RELOAD -----------------
+class CompiledZones:
+    """
+    Immutable, ready-to-use zone set for the detection loop.
+    zones: tuple of zone dicts (for drawing)
+    rects: tuple of (id, x1, y1, x2, y2)
+    thresholds: {zone_id: threshold}
+    """
+    __slots__ = ("version", "zones", "rects", "ids", "thresholds", "_by_camera")
+
+    def __init__(self, zone_list, thresholds=None, version=0):
+        zone_list = [dict(z) for z in zone_list]
+        self.version = version
+        self.zones = tuple(zone_list)
+        self.rects = tuple((z["id"], z["x1"], z["y1"], z["x2"], z["y2"]) for z in zone_list)
+        self.ids = tuple(z["id"] for z in zone_list)
+        self.thresholds = dict(thresholds or {})
+        self._by_camera = {}
+
+    def for_camera(self, camera_id, primary=False):
+        """
+        Zones bound to camera_id, plus the unbound ones if this is the
+        primary camera. Zone rectangles are pixel coordinates of one
+        camera's image, so every zone is counted by exactly one camera.
+        """
+        key = (camera_id, primary)
+        sub = self._by_camera.get(key)
+        if sub is None:
+            zone_list = [z for z in self.zones
+                         if z.get("camera_id") == camera_id
+                         or (primary and z.get("camera_id") is None)]
+            sub = CompiledZones(zone_list, self.thresholds, self.version)
+            self._by_camera[key] = sub
+        return sub
+
+    def zones_for_point(self, cx, cy):
+        """Return the ids of every zone containing (cx, cy)."""
+        return [zid for zid, x1, y1, x2, y2 in self.rects
+                if x1 <= cx <= x2 and y1 <= cy <= y2]
+
+
+class ZoneWatcher:
+    """
+    Watches zones.json (and optionally the DB via meta_loader) from a
+    background thread and swaps a freshly built CompiledZones into
+    `current` whenever something changes.
+
+    The detection loop just reads `watcher.current` once per frame; the
+    attribute assignment is atomic, so inference never waits on a reload.
+
+    meta_loader: optional callable returning {zone_id: threshold}
+    """
+
+    def __init__(self, path=ZONES_FILE, meta_loader=None, interval=1.0):
+        self.path = path
+        self.meta_loader = meta_loader
+        self.interval = interval
+        self._file_sig = None
+        self._meta = {}
+        self._version = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.current = CompiledZones([])
+        self.poll()
+
+    def _file_signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def poll(self):
+        """Check for changes once; returns True if a new set was swapped in."""
+        file_sig = self._file_signature()
+        file_changed = file_sig != self._file_sig
+
+        zone_list = self.current.zones
+        if file_changed:
+            try:
+                zone_list = read_zones_file(self.path)
+            except (OSError, ValueError) as e:
+                # keep running on the old zones until the file is valid
+                # again; _file_sig stays put so it is retried, but DB
+                # threshold edits below are still picked up
+                print("Zone reload failed:", e)
+                file_changed = False
+
+        meta = self._meta
+        if self.meta_loader is not None:
+            try:
+                meta = self.meta_loader()
+            except Exception as e:
+                print("Zone meta reload failed:", e)
+        meta_changed = meta != self._meta
+
+        if not file_changed and not meta_changed:
+            return False
+
+        if file_changed:
+            self._file_sig = file_sig
+        self._meta = meta
+        self._version += 1
+        self.current = CompiledZones(zone_list, meta, self._version)
+        if self._version > 1:
+            print(f"Zones reloaded (v{self._version}): {list(self.current.ids)}")
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.poll()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()